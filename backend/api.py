@@ -1,25 +1,78 @@
-from fastapi import FastAPI, UploadFile, File, status
+from fastapi import FastAPI, UploadFile, File, status, Request, Depends
+import asyncio
+import io
 import os
 from fastapi.exceptions import HTTPException
 import shutil
 from rag.smart_chunking import get_chunked_docs
-from rag.chain import store_documents, load_documents, get_rag_chain
+from rag.combine import shutdown_page_pool
+from rag.chain import store_documents, load_documents, get_rag_chain, VECTOR_PATH
+from rag.cache import SemanticCache
+from rag.embed_onnx import OnnxEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
-from functools import lru_cache
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
+from pydantic import BaseModel
+from typing import Dict
+import logging
 
-@lru_cache
-def get_embeddings():
-    return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+logger = logging.getLogger(__name__)
+
+# Similarity cache of previously answered questions
+semantic_cache = SemanticCache()
+
+# Build the embedding model (called once per process from lifespan)
+def load_embeddings():
+    try:
+        return OnnxEmbeddings(batch_size=64)
+    except Exception as e:
+        # ONNX model missing, failed to export/load or optimum/onnxruntime not
+        # installed: run the PyTorch model on all cores instead
+        logger.warning("ONNX embeddings unavailable, using HuggingFaceEmbeddings: %s", e)
+        import torch
+        torch.set_num_threads(os.cpu_count())
+        return HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2",
+            encode_kwargs={"batch_size": 64, "normalize_embeddings": True}
+        )
+
+# Load the embedding model and any saved vectorstore before serving requests
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.embeddings = await asyncio.to_thread(load_embeddings)
+    app.state.vectorstore = None
+    app.state.vs_lock = asyncio.Lock()
+    app.state.pdf_count = await asyncio.to_thread(count_uploaded_pdfs)
+    if os.path.exists(VECTOR_PATH):
+        app.state.vectorstore = await asyncio.to_thread(load_documents, app.state.embeddings)
+    yield
+    shutdown_page_pool()
+
+def get_embeddings(request: Request) -> Embeddings:
+    return request.app.state.embeddings
+
+# Vectorstore kept in app.state, loaded on first use if it did not exist at startup
+async def get_vectorstore(state, embeddings):
+    if state.vectorstore is None:
+        async with state.vs_lock:
+            if state.vectorstore is None:
+                state.vectorstore = await asyncio.to_thread(load_documents, embeddings)
+    return state.vectorstore
+
+# Add documents to a copy of the vectorstore, persist it and swap it in, so
+# in-flight queries never search an index that is being modified
+async def add_to_vectorstore(state, docs, embeddings):
+    async with state.vs_lock:
+        if state.vectorstore is None and os.path.exists(VECTOR_PATH):
+            state.vectorstore = await asyncio.to_thread(load_documents, embeddings)
+        state.vectorstore = await asyncio.to_thread(store_documents, docs, embeddings, state.vectorstore)
 
-@lru_cache
-def get_vectorstore():
-    return load_documents(embedding_model=get_embeddings())
 
+_FAST_COPY_BUF = 1 << 20
 
 BASE_DIR = Path("/app")
 upload_dir = BASE_DIR / "uploads"
@@ -29,7 +82,8 @@ upload_dir.mkdir(parents=True, exist_ok=True)
 app = FastAPI(
     title="Multi_Rag_System_API",
     description="This is Api for Multi Rag System",
-    version="V1"
+    version="V1",
+    lifespan=lifespan
 )
 
 # CORS middleware 
@@ -45,28 +99,87 @@ app.add_middleware(
 system_stats = {
     "total_uploads": 0,
     "total_queries": 0,
-    "start_time": datetime.now().isoformat()
+    "start_time": datetime.now()
 }
 
+# Count PDFs stored in the upload directory (only at startup into app.state.pdf_count,
+# /upload keeps it current)
+def count_uploaded_pdfs():
+    with os.scandir(upload_dir) as entries:
+        return sum(1 for f in entries if f.name.endswith(".pdf") and f.is_file())
+
+
+# Copy the uploaded file to disk (blocking, run it off the event loop)
+def save_upload(file_path, source):
+    with open(file_path, "wb") as f:
+        # Uploads spooled to disk (SpooledTemporaryFile._rolled) are copied in-kernel,
+        # calling fileno() on an in-memory spool would force it to disk first
+        if hasattr(os, "copy_file_range") and getattr(source, "_rolled", True):
+            start = source.tell()
+            try:
+                src_fd, dst_fd = source.fileno(), f.fileno()
+                offset = start
+                while copied := os.copy_file_range(src_fd, dst_fd, _FAST_COPY_BUF * 64, offset):
+                    offset += copied
+                return
+            except (OSError, io.UnsupportedOperation):
+                source.seek(start)
+                f.seek(0)
+                f.truncate()
+        shutil.copyfileobj(source, f, length=_FAST_COPY_BUF)
+
+
+# Request/response models (responses are validated and serialized by pydantic
+# directly instead of going through jsonable_encoder)
+class QueryRequest(BaseModel):
+    input: str
+
+class RootResponse(BaseModel):
+    message: str
+    version: str
+    endpoints: Dict[str, str]
+
+class HealthResponse(BaseModel):
+    status: str
+    timestamp: datetime
+    upload_directory: bool
+    uploaded_documents: int
+    embeddings_model: str
+
+class SystemStats(BaseModel):
+    total_uploads: int
+    total_queries: int
+    start_time: datetime
+
+class StatsResponse(BaseModel):
+    stats: SystemStats
+    uploaded_documents: int
+    current_time: datetime
+
+class UploadResponse(BaseModel):
+    message: str
+    chunks_created: int
+
+
 # Info about API
 @app.get("/")
-async def root():
+async def root() -> RootResponse:
     """Root endpoint with API information"""
-    return {
-        "message": "Multi-Modal RAG System API",
-        "version": "v1.0.0",
-        "endpoints": {
+    return RootResponse(
+        message="Multi-Modal RAG System API",
+        version="v1.0.0",
+        endpoints={
             "health": "/health",
             "upload": "/upload",
             "query": "/query",
             "stats": "/stats",
             "docs": "/docs"
         }
-    }
+    )
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request) -> HealthResponse:
     """Health check endpoint for monitoring"""
     try:
         # Check if upload directory exists
@@ -74,15 +187,15 @@ async def health_check():
 
         
         # Count uploaded files
-        uploaded_files = len(list(upload_dir.glob("*.pdf"))) if upload_dir_exists else 0
+        uploaded_files = request.app.state.pdf_count if upload_dir_exists else 0
         
-        return {
-            "status": "healthy",
-            "timestamp": datetime.now().isoformat(),
-            "upload_directory": upload_dir_exists,
-            "uploaded_documents": uploaded_files,
-            "embeddings_model": "sentence-transformers/all-MiniLM-L6-v2"
-        }
+        return HealthResponse(
+            status="healthy",
+            timestamp=datetime.now(),
+            upload_directory=upload_dir_exists,
+            uploaded_documents=uploaded_files,
+            embeddings_model="sentence-transformers/all-MiniLM-L6-v2"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -92,68 +205,92 @@ async def health_check():
 
 # Tracks the System_stats
 @app.get("/stats")
-async def get_stats():
+async def get_stats(request: Request) -> StatsResponse:
     """Get system statistics"""
-    return {
-    "stats": system_stats,
-    "uploaded_documents": len(list(upload_dir.glob("*.pdf"))),
-    "current_time": datetime.now().isoformat()
-}
+    return StatsResponse(
+        stats=SystemStats(**system_stats),
+        uploaded_documents=request.app.state.pdf_count,
+        current_time=datetime.now()
+    )
 
 
 # This Endpoint upload Pdf and store into VectorDatabase
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    request: Request,
+    file: UploadFile = File(...),
+    embeddings: Embeddings = Depends(get_embeddings)
+) -> UploadResponse:
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
     file_path = upload_dir / file.filename
+    is_new_file = not file_path.exists()
 
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    await asyncio.to_thread(save_upload, file_path, file.file)
+    if is_new_file:
+        request.app.state.pdf_count += 1
 
-    chunked_docs = get_chunked_docs(file_path)
+    chunked_docs = await asyncio.to_thread(get_chunked_docs, file_path)
 
     if not chunked_docs:
         raise HTTPException(status_code=500, detail="No content extracted from PDF")
 
-    store_documents(chunked_docs, get_embeddings())
+    await add_to_vectorstore(request.app.state, chunked_docs, embeddings)
+    semantic_cache.clear()
     
     # INCREMENT THE COUNTER HERE!
     system_stats["total_uploads"] += 1
 
-    return {
-        "message": "PDF uploaded and indexed successfully",
-        "chunks_created": len(chunked_docs)
-    }
+    return UploadResponse(
+        message="PDF uploaded and indexed successfully",
+        chunks_created=len(chunked_docs)
+    )
     
-from pydantic import BaseModel
-
-class QueryRequest(BaseModel):
-    input: str
 
 
-# This Endpoint Load the VectorDataBase and answer the User question
+# This Endpoint Load the VectorDataBase and stream the answer to the User question
 @app.post("/query")
-async def get_response(req: QueryRequest):
+async def get_response(
+    req: QueryRequest,
+    request: Request,
+    embeddings: Embeddings = Depends(get_embeddings)
+) -> StreamingResponse:
     try:
-        vectorstore = get_vectorstore()
+        query_vector = await asyncio.to_thread(embeddings.embed_query, req.input)
+        cache_generation = semantic_cache.generation
+        answer = semantic_cache.lookup(query_vector)
+
+        if answer is not None:
+            system_stats["total_queries"] += 1
+            return StreamingResponse(iter([answer]), media_type="text/plain")
+
+        vectorstore = await get_vectorstore(request.app.state, embeddings)
         retriever = vectorstore.as_retriever(
             search_type="mmr",
             search_kwargs={"k": 3}
         )
         chain = get_rag_chain(retriever)
-        response = chain.invoke(req.input)
 
-        system_stats["total_queries"] += 1
-
-        return {
-            "question": req.input,
-            "response": response.content
-        }
+        # Pull the first chunk here so retrieval and LLM errors (bad key, rate
+        # limits) still become a 500 before the response headers are sent
+        stream = chain.astream(req.input)
+        first_chunk = await anext(stream, None)
 
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Query processing failed: {str(e)}"
         )
+
+    async def stream_answer():
+        parts = []
+        chunk = first_chunk
+        while chunk is not None:
+            parts.append(chunk.content)
+            yield chunk.content
+            chunk = await anext(stream, None)
+        semantic_cache.insert(query_vector, "".join(parts), cache_generation)
+        system_stats["total_queries"] += 1
+
+    return StreamingResponse(stream_answer(), media_type="text/plain")
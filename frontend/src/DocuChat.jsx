@@ -1,6 +1,7 @@
 import { useState, useRef, useEffect } from "react";
 
 const API_BASE = import.meta.env.VITE_API_BASE;
+const STATS_TTL_MS = 5000;
 
 const UploadIcon = () => (
   <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2">
@@ -71,20 +72,30 @@ export default function RAGSystem() {
   const fileRef = useRef(null);
   const chatEndRef = useRef(null);
   const textareaRef = useRef(null);
+  const statsFetchedAt = useRef(0);
 
   useEffect(() => {
     chatEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
+  // Stats are only shown on the Stats tab, fetch them when it opens
   useEffect(() => {
-    fetchStats();
-  }, []);
+    if (activeTab === "stats") fetchStats();
+  }, [activeTab]);
 
   async function fetchStats() {
+    if (Date.now() - statsFetchedAt.current < STATS_TTL_MS) return;
+    statsFetchedAt.current = Date.now();
     try {
       const res = await fetch(`${API_BASE}/stats`);
       if (res.ok) setStats(await res.json());
-    } catch {}
+    } catch {
+      statsFetchedAt.current = 0;
+    }
+  }
+
+  function invalidateStats() {
+    statsFetchedAt.current = 0;
   }
 
   async function handleUpload(file) {
@@ -105,7 +116,7 @@ export default function RAGSystem() {
         content: `📄 **${file.name}** indexed successfully — ${data.chunks_created} chunks ready. Ask me anything about it.`,
         ts: new Date()
       }]);
-      fetchStats();
+      invalidateStats();
     } catch (e) {
       setUploadState({ status: "error", filename: file.name, chunks: 0, error: e.message });
     }
@@ -124,14 +135,30 @@ export default function RAGSystem() {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ input: q })
       });
-      const data = await res.json();
-      if (!res.ok) throw new Error(data.detail || "Query failed");
-      setMessages(prev => {
-        const updated = [...prev];
-        updated[updated.length - 1] = { role: "assistant", content: data.response, ts: new Date() };
-        return updated;
-      });
-      fetchStats();
+      if (!res.ok) {
+        const data = await res.json();
+        throw new Error(data.detail || "Query failed");
+      }
+      // Answer is streamed as plain text, render it as it arrives
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let answer = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        // the final decode() flushes bytes of a character split across chunks
+        answer += done ? decoder.decode() : decoder.decode(value, { stream: true });
+        const content = answer;
+        if (content) {
+          setMessages(prev => {
+            const updated = [...prev];
+            updated[updated.length - 1] = { role: "assistant", content, ts: new Date() };
+            return updated;
+          });
+        }
+        if (done) break;
+      }
+      if (!answer) throw new Error("Empty response");
+      invalidateStats();
     } catch (e) {
       setMessages(prev => {
         const updated = [...prev];
@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+from typing import List, Optional
+
+import faiss
+import numpy as np
+
+
+# Semantic cache: remembers (question embedding -> answer) pairs and returns the
+# stored answer when a new question is close enough to one already answered.
+# The similarity threshold adapts between max_threshold and min_threshold so the
+# hit rate over the last `window` lookups drifts towards target_hit_rate. The
+# floor stays high because MiniLM scores questions that differ only in a number
+# or year around 0.9.
+class SemanticCache:
+    def __init__(
+        self,
+        max_threshold: float = 0.99,
+        min_threshold: float = 0.95,
+        target_hit_rate: float = 0.3,
+        step: float = 0.005,
+        window: int = 200,
+        max_entries: int = 2048,
+    ):
+        self.max_threshold = max_threshold
+        self.min_threshold = min_threshold
+        self.threshold = max_threshold
+        self.target_hit_rate = target_hit_rate
+        self.step = step
+        self.max_entries = max_entries
+        self.index = None
+        self.vectors: List[np.ndarray] = []
+        self.answers: List[str] = []
+        self.recent_hits = deque(maxlen=window)
+        # bumped by clear(), answers computed against an older index are dropped
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _as_query(vector: List[float]) -> np.ndarray:
+        query = np.asarray(vector, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(query)
+        return query
+
+    # Funtion to move the threshold towards the target hit rate
+    def _adjust_threshold(self):
+        hit_rate = sum(self.recent_hits) / len(self.recent_hits)
+        if hit_rate < self.target_hit_rate:
+            self.threshold = max(self.min_threshold, self.threshold - self.step)
+        else:
+            self.threshold = min(self.max_threshold, self.threshold + self.step)
+
+    def lookup(self, vector: List[float]) -> Optional[str]:
+        query = self._as_query(vector)
+        with self._lock:
+            answer = None
+            if self.index is not None and self.index.ntotal:
+                scores, ids = self.index.search(query, 1)
+                if scores[0][0] >= self.threshold:
+                    answer = self.answers[ids[0][0]]
+            self.recent_hits.append(answer is not None)
+            self._adjust_threshold()
+            return answer
+
+    # Funtion to drop the oldest entries (10% at a time) and rebuild the index
+    def _evict(self):
+        keep = self.max_entries - max(1, self.max_entries // 10)
+        self.vectors = self.vectors[-keep:]
+        self.answers = self.answers[-keep:]
+        self.index = faiss.IndexFlatIP(self.vectors[0].shape[1])
+        self.index.add(np.vstack(self.vectors))
+
+    def insert(self, vector: List[float], answer: str, generation: int):
+        query = self._as_query(vector)
+        with self._lock:
+            if generation != self.generation:
+                return
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(query.shape[1])
+            self.index.add(query)
+            self.vectors.append(query)
+            self.answers.append(answer)
+            if len(self.answers) > self.max_entries:
+                self._evict()
+
+    # Answers depend on the indexed documents, so drop them when the index changes
+    def clear(self):
+        with self._lock:
+            self.index = None
+            self.vectors = []
+            self.answers = []
+            self.generation += 1
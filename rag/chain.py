@@ -2,45 +2,114 @@ from langchain_groq import ChatGroq
 from .smart_chunking import get_chunked_docs
 from langchain_core.documents import Document
 from typing import List
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+import faiss
 import os
+from functools import lru_cache
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import ChatPromptTemplate
 
 VECTOR_PATH = "vectorstore/faiss_index"
 
-llm = ChatGroq(model="llama-3.3-70b-versatile")
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+# HNSW graph parameters (neighbours per node, build and search beam width)
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+
+# LLM client is created on first use instead of at import
+@lru_cache
+def get_llm():
+    return ChatGroq(model="llama-3.3-70b-versatile")
+
+
+# Citation prefix for a chunk, e.g. "(report.pdf, Page 3, Table 1)"
+def format_citation(meta):
+    parts = [meta.get("source"), f"Page {meta.get('page')}", meta.get("ref")]
+    return "(" + ", ".join(p for p in parts if p) + ")"
 
 
 # This funtion include page_content + metadata fot better retrieval
 def format_docs_with_metadata(docs):
-    formatted = []
-    for d in docs:
-        meta = d.metadata
-        citation = f"(Page {meta.get('page')}"
-        if meta.get("ref"):
-            citation += f", {meta.get('ref')}"
-        citation += ")"
-
-        formatted.append(
-            f"{citation}\n{d.page_content}"
-        )
-    return "\n\n".join(formatted)
+    return "\n\n".join([f"{format_citation(d.metadata)}\n{d.page_content}" for d in docs])
 
 
-# Funtion For Storing Documents into VectorDatabase
-def store_documents(docs:List[Document],embedding_model:str):
-    vectorstore = FAISS.from_documents(docs,embedding=embedding_model)
-    vectorstore.save_local(VECTOR_PATH)
+# Funtion to set how many HNSW candidates are explored per query
+def set_ef_search(vectorstore:FAISS):
+    if hasattr(vectorstore.index, "hnsw"):
+        vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
     return vectorstore
 
+
+# Funtion to copy a vectorstore (index, docstore and id map) so it can be extended
+# while queries keep searching the original
+def copy_vectorstore(vectorstore:FAISS):
+    return FAISS(
+        embedding_function=vectorstore.embedding_function,
+        index=faiss.clone_index(vectorstore.index),
+        docstore=InMemoryDocstore(dict(vectorstore.docstore._dict)),
+        index_to_docstore_id=dict(vectorstore.index_to_docstore_id),
+        relevance_score_fn=vectorstore.override_relevance_score_fn,
+        normalize_L2=vectorstore._normalize_L2,
+        distance_strategy=vectorstore.distance_strategy
+    )
+
+
+# Funtion to collect (text, vector) pairs and metadata of stored chunks whose
+# source is not in `sources`, in index order
+def stored_chunks_except(vectorstore:FAISS,sources:set):
+    text_embeddings, metadatas = [], []
+    for i, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+        doc = vectorstore.docstore.search(doc_id)
+        if doc.metadata.get("source") in sources:
+            continue
+        text_embeddings.append((doc.page_content, vectorstore.index.reconstruct(int(i))))
+        metadatas.append(doc.metadata)
+    return text_embeddings, metadatas
+
+
+# Funtion For Storing Documents into VectorDatabase. If a vectorstore is given,
+# a copy of it is extended and returned, the given one is never modified.
+# Chunks already stored for the same source (re-uploaded PDF) are replaced.
+def store_documents(docs:List[Document],embedding_model:str,vectorstore:FAISS=None):
+    texts = [d.page_content for d in docs]
+    text_embeddings = list(zip(texts, embedding_model.embed_documents(texts)))
+    metadatas = [d.metadata for d in docs]
+
+    sources = {d.metadata.get("source") for d in docs} - {None}
+    if vectorstore is not None and any(
+        vectorstore.docstore.search(doc_id).metadata.get("source") in sources
+        for doc_id in vectorstore.index_to_docstore_id.values()
+    ):
+        # HNSW indexes cannot remove ids, so rebuild from the chunks that stay
+        kept_embeddings, kept_metadatas = stored_chunks_except(vectorstore, sources)
+        text_embeddings = kept_embeddings + text_embeddings
+        metadatas = kept_metadatas + metadatas
+        vectorstore = None
+
+    if vectorstore is None:
+        index = faiss.IndexHNSWFlat(len(text_embeddings[0][1]), HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        vectorstore = FAISS(
+            embedding_function=embedding_model,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+    else:
+        vectorstore = copy_vectorstore(vectorstore)
+
+    vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+    vectorstore.save_local(VECTOR_PATH)
+    return set_ef_search(vectorstore)
+
 # Funtion to load VectorDatabase for Retrieval Process
 def load_documents(embedding_model:str):
     if not os.path.exists(VECTOR_PATH):
         raise ValueError("Vectorstore not found,Upload Your Document First")
-    return FAISS.load_local(VECTOR_PATH,embeddings=embedding_model,allow_dangerous_deserialization=True)
+    vectorstore = FAISS.load_local(VECTOR_PATH,embeddings=embedding_model,allow_dangerous_deserialization=True)
+    return set_ef_search(vectorstore)
     
 
 # Prompt for LLM to execute Your task more efficiently
@@ -74,7 +143,7 @@ def get_rag_chain(retriever):
         "input": RunnablePassthrough()
     }
     |prompt
-    |llm
+    |get_llm()
     )
     return chain
 
@@ -1,10 +1,16 @@
-import pdfplumber
 import fitz
 import camelot
 import pytesseract
-from PIL import Image
-import io
 import re
+import os
+import subprocess
+import tempfile
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from collections import defaultdict
 
 
 def clean_text(text: str) -> str:
@@ -14,64 +20,179 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
-# Raw Documents
-def raw_document_text(pdf_path: str):
-    documents = []
+# Image formats tesseract (leptonica) reads directly
+TESSERACT_FORMATS = {"png", "jpg", "jpeg", "tif", "tiff", "bmp", "gif", "webp", "pnm"}
+
+
+# OCR a batch of encoded images, given as (bytes, ext) pairs, with a single
+# tesseract process (list-file batch mode)
+def ocr_images(images: list) -> list:
+    if not images:
+        return []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for idx, (data, ext) in enumerate(images):
+            path = os.path.join(tmp_dir, f"{idx}.{ext}")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+
+        list_path = os.path.join(tmp_dir, "images.txt")
+        with open(list_path, "w") as f:
+            f.write("\n".join(paths) + "\n")
+
+        # pages already run in parallel in the pool, keep tesseract to one
+        # OpenMP thread so workers do not oversubscribe the cores
+        result = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, list_path, "stdout"],
+            capture_output=True,
+            check=True,
+            env={**os.environ, "OMP_THREAD_LIMIT": "1"}
+        )
+
+    # tesseract ends the text of every input image with a form feed
+    texts = result.stdout.decode("utf-8", errors="replace").split("\f")[:len(images)]
+    return texts + [""] * (len(images) - len(texts))
+
 
-    with pdfplumber.open(pdf_path) as pdf:
-        doc_fitz = fitz.open(pdf_path)
+# Embedded image as (bytes, ext): the stored stream as-is when tesseract can read
+# its format (no decode/re-encode), otherwise the decoded pixmap as PNG
+def extract_ocr_image(doc_fitz, xref: int):
+    info = doc_fitz.extract_image(xref)
+    if info and info.get("ext") in TESSERACT_FORMATS:
+        return info["image"], info["ext"]
 
-        for page_index, page in enumerate(pdf.pages, start=1):
+    pix = fitz.Pixmap(doc_fitz, xref)
+    if pix.colorspace and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    return pix.tobytes("png"), "png"
 
-            # TEXT
-            text = page.extract_text()
-            if text:
-                documents.append({
-                    "content": clean_text(text),
+
+# Extract text and OCR text of a single page (opens its own handles so it can run in a worker process)
+def _process_page(pdf_path: str, page_index: int):
+    text_docs = []
+    image_docs = []
+
+    with fitz.open(pdf_path) as doc_fitz:
+        page_fitz = doc_fitz[page_index - 1]
+
+        # TEXT
+        text = page_fitz.get_text("text")
+        if text.strip():
+            text_docs.append({
+                "content": clean_text(text),
+                "metadata": {
+                    "page": page_index,
+                    "type": "text"
+                }
+            })
+
+        # IMAGES + OCR
+        images = page_fitz.get_images(full=True)
+
+        page_images = []
+        for img in images:
+            xref = img[0]
+            page_images.append(extract_ocr_image(doc_fitz, xref))
+
+        for img_idx, ocr_text in enumerate(ocr_images(page_images)):
+            if ocr_text.strip():
+                image_docs.append({
+                    "content": clean_text(ocr_text),
                     "metadata": {
                         "page": page_index,
-                        "type": "text"
+                        "type": "image",
+                        "ref": f"Image {img_idx + 1}"
                     }
                 })
 
-            # TABLES
-            tables = camelot.read_pdf(
-                pdf_path,
-                pages=str(page_index),
-                flavor="stream"
+    return text_docs, image_docs
+
+
+# One camelot pass over the whole PDF, tables grouped by page number
+def _extract_tables(pdf_path: str) -> dict:
+    tables_by_page = defaultdict(list)
+    for table in camelot.read_pdf(pdf_path, pages="all", flavor="stream"):
+        tables_by_page[int(table.page)].append(table.df.to_string(index=False))
+    return dict(tables_by_page)
+
+
+def _table_docs(page_index: int, tables: list) -> list:
+    return [
+        {
+            "content": clean_text(table_text),
+            "metadata": {
+                "page": page_index,
+                "type": "table",
+                "ref": f"Table {t_idx + 1}"
+            }
+        }
+        for t_idx, table_text in enumerate(tables)
+    ]
+
+
+# Worker pool for page processing, created once and reused across uploads
+# (spawned workers import camelot/cv2/fitz, which is too slow to repeat per upload).
+# Workers are capped (PAGE_WORKERS env) by the CPUs this process may run on,
+# not the host core count, so idle workers do not hold memory in a small container
+def _default_page_workers() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return min(4, cpus)
+
+PAGE_WORKERS = int(os.environ.get("PAGE_WORKERS", _default_page_workers()))
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+def get_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=PAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
             )
+        return _page_pool
 
-            for t_idx, table in enumerate(tables):
-                table_text = table.df.to_string(index=False)
-                documents.append({
-                    "content": clean_text(table_text),
-                    "metadata": {
-                        "page": page_index,
-                        "type": "table",
-                        "ref": f"Table {t_idx + 1}"
-                    }
-                })
+def shutdown_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False, cancel_futures=True)
+            _page_pool = None
+
+
+# Raw Documents (the camelot pass and the pages run in parallel in the page pool,
+# output keeps page order: text, tables, then images of each page)
+def raw_document_text(pdf_path: str):
+    pdf_path = str(pdf_path)
+    with fitz.open(pdf_path) as doc_fitz:
+        n_pages = doc_fitz.page_count
+
+    if n_pages == 0:
+        return []
 
-            # IMAGES + OCR
-            page_fitz = doc_fitz[page_index - 1]
-            images = page_fitz.get_images(full=True)
-
-            for img_idx, img in enumerate(images):
-                xref = img[0]
-                base_image = doc_fitz.extract_image(xref)
-                image_bytes = base_image["image"]
-
-                image = Image.open(io.BytesIO(image_bytes))
-                ocr_text = pytesseract.image_to_string(image)
-
-                if ocr_text.strip():
-                    documents.append({
-                        "content": clean_text(ocr_text),
-                        "metadata": {
-                            "page": page_index,
-                            "type": "image",
-                            "ref": f"Image {img_idx + 1}"
-                        }
-                    })
-
-    return documents
\ No newline at end of file
+    pages = range(1, n_pages + 1)
+    try:
+        pool = get_page_pool()
+        # submitted first so a worker starts on it while the others take the pages
+        tables_future = pool.submit(_extract_tables, pdf_path)
+        page_results = list(pool.map(partial(_process_page, pdf_path), pages))
+        tables_by_page = tables_future.result()
+    except BrokenProcessPool:
+        # a worker died, start a fresh pool for the next upload
+        shutdown_page_pool()
+        raise
+
+    documents = []
+    for page_index, (text_docs, image_docs) in zip(pages, page_results):
+        documents.extend(text_docs)
+        documents.extend(_table_docs(page_index, tables_by_page.get(page_index, [])))
+        documents.extend(image_docs)
+    return documents
@@ -0,0 +1,89 @@
+import os
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from transformers import AutoTokenizer
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_DIR = "models/all-MiniLM-L6-v2-onnx-int8"
+ONNX_FILE = "model_quantized.onnx"
+
+
+# Shared tokenizer for token counting only (no truncation/padding), used by
+# the text splitter
+@lru_cache
+def get_tokenizer(model_name: str = MODEL_NAME):
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+# Export the model to ONNX and int8-quantize it once, later runs reuse the file
+def export_quantized_model(model_name: str = MODEL_NAME, save_dir: str = ONNX_DIR) -> str:
+    model_path = os.path.join(save_dir, ONNX_FILE)
+    if not os.path.exists(model_path):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        quantizer = ORTQuantizer.from_pretrained(model)
+        # The image may be built on a different CPU than it runs on, so use the
+        # AVX2 config (reduce_range avoids int8 overflow without VNNI)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False, reduce_range=True)
+        quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+    return model_path
+
+
+# Sentence embeddings from an int8 ONNX Runtime session, with the same
+# mean pooling + L2 normalization as the sentence-transformers model
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_name: str = MODEL_NAME, batch_size: int = 64, max_length: int = 256):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = ort.InferenceSession(
+            export_quantized_model(model_name),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # Own instance: HF fast tokenizers keep truncation/padding state and raise
+        # "Already borrowed" when threads use one instance with different settings
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    # Tokenize without padding; every call uses the same settings so the tokenizer
+    # state is never changed between threads
+    def _tokenize(self, texts: List[str]):
+        return self.tokenizer(texts, padding=False, truncation=True, max_length=self.max_length)
+
+    # Pad one batch of tokenized texts, run the model, mean-pool and L2-normalize
+    def _embed(self, features: dict) -> np.ndarray:
+        inputs = self.tokenizer.pad(features, return_tensors="np")
+        feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self.input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    # Texts are tokenized once, sorted by token count and batched, so each batch
+    # pads to a similar length; vectors are returned in the input order
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        encoded = self._tokenize(texts)
+        order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
+
+        vectors = [None] * len(texts)
+        for start in range(0, len(texts), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            features = {k: [encoded[k][i] for i in batch] for k in encoded.keys()}
+            for i, vector in zip(batch, self._embed(features).tolist()):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(dict(self._tokenize([text])))[0].tolist()
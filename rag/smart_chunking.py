@@ -1,46 +1,38 @@
-from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from functools import lru_cache
+import os
 from .combine import raw_document_text
 from .lang_doc import get_langchain_docs
+from .embed_onnx import get_tokenizer
 
-# Smart Chunks Documents
-def smart_text_chunker(doc, max_chars=500):
-    chunks = []
-    buffer = ""
+# all-MiniLM-L6-v2 truncates inputs at 256 tokens (incl. [CLS]/[SEP])
+CHUNK_TOKENS = 250
+CHUNK_OVERLAP_TOKENS = 50
 
-    paragraphs = doc.page_content.split("\n\n")
 
-    for para in paragraphs:
-        if len(buffer) + len(para) <= max_chars:
-            buffer += para + "\n\n"
-        else:
-            chunks.append(
-                Document(
-                    page_content=buffer.strip(),
-                    metadata=doc.metadata
-                )
-            )
-            buffer = para + "\n\n"
-
-    if buffer.strip():
-        chunks.append(
-            Document(
-                page_content=buffer.strip(),
-                metadata=doc.metadata
-            )
-        )
-
-    return chunks
+# Token-aware splitter with overlap, sized to the embedding model
+@lru_cache
+def get_text_splitter():
+    return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        get_tokenizer(),
+        chunk_size=CHUNK_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
 
 
 # Funtion for Raw Documents -> Langchain Document -> Smart Chunking Documents
 def get_chunked_docs(pdf:str):
     chunked_docs = []
     docs = raw_document_text(pdf)
+    source = os.path.basename(str(pdf))
+    for doc in docs:
+        doc["metadata"]["source"] = source
     documents = get_langchain_docs(docs)
     for doc in documents:
         doc_type = doc.metadata["type"]
         if doc_type == "text":
-            chunked_docs.extend(smart_text_chunker(doc))
+            chunked_docs.extend(get_text_splitter().split_documents([doc]))
         elif doc_type == "table":
             chunked_docs.append(doc)
         elif doc_type == "image":